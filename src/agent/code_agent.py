@@ -1,41 +1,181 @@
 from src.base_class.base_agent import BaseAgent
 from src.base_class.base_tool import BaseTool
-from typing import List
-import subprocess
-from src.llm_call import llm_call, extract_xml
-from src.prompts.code_agent_prompt import prompt_template
-from src.tool.python_runner import PythonRunner
+from typing import Any, Dict, List, Literal, Optional
+import asyncio
+import json
+import logging
+import os
+import weakref
+from src.llm_call import extract_xml, get_llm_batcher, close_async_clients
+from src.prompts.code_agent_prompt import prompt_template, shell_prompt_template
+from src.tool.python_runner import PythonRunner, compile_code
+from src.utils.llm_cache import LLMCache
 import re
-import ast
+import shlex
+
+# Constant part of every first prompt, built once instead of per task
+_PROMPT_HEAD = prompt_template + "\nTask: "
+
+# Prompt template used by each mode when none is given
+_DEFAULT_PROMPT_TEMPLATES = {"python": prompt_template, "shell": shell_prompt_template}
+# Model used by each mode when no model_id is given
+_DEFAULT_MODEL_IDS = {"python": "qwen2.5:1.5b", "shell": "gpt-3.5-turbo"}
+# Keys every shell-mode result carries; copied and filled in once per call
+_RESULT_TEMPLATE: Dict[str, Any] = {
+    "success": True,
+    "result": None,
+    "stdout": "",
+    "stderr": "",
+    "returncode": 0,
+    "linux_cmd": ""
+}
+
+# Patterns used on every step, compiled once at import time
+_CODE_BLOCK_RE = re.compile(r"```(?:py|python)?\n(.*?)\n```", re.DOTALL)
+_CODE_PREFIX_RE = re.compile(r"(?:Code:|code:)\s*\n(.*?)(?:\n\s*(?:Observation:|<end_code>|$))", re.DOTALL)
+_FINAL_ANSWER_RE = re.compile(r"Final answer: (.*?)(?:\n|$)", re.IGNORECASE)
+# Shell output beyond this many bytes per stream is drained but not kept
+_MAX_OUTPUT_BYTES = 1024 * 1024
+_READ_CHUNK_SIZE = 64 * 1024
+# Observations are fed into every later prompt, so cap what each step adds
+_MAX_OBSERVATION_CHARS = 4000
+# Commands containing any of these need /bin/sh; the rest are exec'd directly
+_SHELL_METACHARS = frozenset("|&;<>()$`\\*?[]{}#~=!\n")
+_SHELL_BUILTINS = frozenset(("cd", "export", "source", ".", "alias", "unset", "set", "exit", "eval", "exec"))
+# Upper bound on shell commands running at once, shared by every agent on an event loop
+_MAX_CONCURRENT_COMMANDS = min(8, os.cpu_count() or 1)
+_command_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _get_command_semaphore() -> asyncio.Semaphore:
+    """
+    Returns the semaphore limiting concurrent shell commands on the running loop.
+    """
+    loop = asyncio.get_running_loop()
+    if loop not in _command_semaphores:
+        _command_semaphores[loop] = asyncio.Semaphore(_MAX_CONCURRENT_COMMANDS)
+    return _command_semaphores[loop]
+
+
+# Responses for identical prompts, keyed by a digest of the request to keep entries small
+_llm_cache = LLMCache(max_size=2048)
+
+
+async def _llm_cached(model_id: str, prompt: str) -> str:
+    """
+    Returns the cached response for the prompt, querying the model on a miss.
+
+    Args:
+        model_id: The model to query.
+        prompt: The prompt to send to the model.
+
+    Returns:
+        The response from the language model.
+    """
+    # Same messages the batcher sends, so the key describes the actual request
+    messages = [{"role": "system", "content": ""}, {"role": "user", "content": prompt}]
+    response = _llm_cache.get(model_id, messages)
+    if response is None:
+        response = await get_llm_batcher(model_id).submit(prompt)
+        _llm_cache.set(model_id, messages, response)
+    return response
 
 class CodeAgent(BaseAgent):
-    def __init__(self, tools: List[BaseTool], max_steps: int=1) -> None:
-        super().__init__(tools, prompt_template)
+    def __init__(
+        self,
+        tools: List[BaseTool],
+        max_steps: int=1,
+        model_id: Optional[str]=None,
+        enable_cache: bool=True,
+        mode: Literal["python", "shell"]="python",
+        prompt_template: Optional[str]=None
+    ) -> None:
+        """
+        Args:
+            tools: The tools available to the agent.
+            max_steps: Maximum number of Thought/Code/Observation steps in python mode.
+            model_id: The model to query; defaults per mode, see _DEFAULT_MODEL_IDS.
+            enable_cache: Whether identical prompts reuse the cached LLM response.
+            mode: "python" solves tasks by running generated Python code,
+                "shell" asks for a single linux command and runs it.
+            prompt_template: Overrides the mode's default prompt template.
+        """
+        super().__init__(tools, max_steps)
+        if mode not in _DEFAULT_MODEL_IDS:
+            raise ValueError(f"Unknown CodeAgent mode: {mode}")
+        self.mode = mode
         # Only set the default prompt template if none was provided
-        # if prompt_template is None:
-        self.prompt_template = prompt_template        
-        self.python_runner = PythonRunner()
-        self.max_steps = max_steps
+        if prompt_template is None:
+            prompt_template = _DEFAULT_PROMPT_TEMPLATES[mode]
+            self.logger.debug(f"Using default prompt template for {mode} mode")
+        self.prompt_template = prompt_template
+        if prompt_template is _DEFAULT_PROMPT_TEMPLATES["python"]:
+            self._prompt_head = _PROMPT_HEAD
+        else:
+            self._prompt_head = prompt_template + "\nTask: "
+        self.python_runner = PythonRunner(timeout=30)
+        self.model_id = model_id or _DEFAULT_MODEL_IDS[mode]
+        # Disable when sampling is stochastic and repeated prompts should get fresh responses
+        self.enable_cache = enable_cache
     
     def run(self, task: str) -> dict:
+        """
+        Synchronous wrapper around `run_async` for callers without an event loop.
+        """
+        async def run_and_close() -> dict:
+            try:
+                return await self.run_async(task)
+            finally:
+                # The event loop ends with this call, so release its LLM connections
+                await close_async_clients()
+        
+        return asyncio.run(run_and_close())
+
+    async def run_async(self, task: str) -> dict:
+        """
+        Runs the agent on the given task.
+
+        LLM calls go through a shared micro-batcher, so several agents can be driven
+        concurrently, e.g. with `asyncio.gather(*[agent.run_async(t) for t in tasks])`.
+
+        Args:
+            task: The task to solve.
+
+        Returns:
+            A dictionary containing the final answer, the number of steps and a success flag.
+            In shell mode, the result of `_run_shell_async` instead.
+        """
+        if self.mode == "shell":
+            return await self._run_shell_async(task)
         self.logger.info(f"Running CodeAgent with task: {task[:50]}...")
         final_answer = None
-        prompt = self.prompt_template + "\n" + f"Task: {task}" + '\n'
+        # Collect the transcript as parts and join once per LLM call instead of
+        # re-concatenating the whole history after every step
+        prompt_parts = [self._prompt_head, task, "\n"]
+        # Variables and imports persist between the code blocks of one task
+        namespace = self.python_runner.new_namespace()
         step = 0
         while step < self.max_steps and final_answer is None:
-            self.logger.debug(f"Generated prompt: {prompt[:100]}...")
-            self.logger.info(f"LLM prompt: {prompt}")
-            response = self.query_llm(prompt)
-            self.logger.info(f"Received response from LLM:")
-            self.logger.info(f"Response: {response}")
+            prompt = "".join(prompt_parts)
+            # The prompt grows every step, so only build these strings when DEBUG is on
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug("Generated prompt: %s...", prompt[:100])
+                self.logger.debug("LLM prompt: %s", prompt)
+            response = await self.query_llm(prompt)
+            self.logger.info(f"Received response from LLM at step {step}")
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug("Response: %s", response)
             
             try:
                 codes = self.extract_codes(response)
                 if codes:
                     # Run the code and capture the output
-                    observation = self.get_observation(codes)
+                    observation = self.get_observation(codes, namespace)
                     final_answer = self.extract_final_answer(observation)
-                    self.logger.debug(f"Code execution output: {observation}")
+                    if self.logger.isEnabledFor(logging.DEBUG):
+                        self.logger.debug("Code execution output: %s", observation)
                 else:
                     observation = "No valid code found in the response."
                     self.logger.warning("No valid code found in the response")
@@ -43,7 +183,11 @@ class CodeAgent(BaseAgent):
                 observation = f"Error: {str(e)}"
                 self.logger.error(f"Error processing response: {str(e)}", exc_info=True)
             
-            prompt = prompt + response + "\n" + f"Observation: {observation}" + '\n'
+            observation = str(observation)
+            if len(observation) > _MAX_OBSERVATION_CHARS:
+                omitted = len(observation) - _MAX_OBSERVATION_CHARS
+                observation = f"{observation[:_MAX_OBSERVATION_CHARS]}\n... [{omitted} characters truncated]"
+            prompt_parts.extend((response, "\n", "Observation: ", observation, "\n"))
             step += 1
             
         result = {
@@ -54,6 +198,127 @@ class CodeAgent(BaseAgent):
         self.logger.info(f"Final result: {result}")
         return result
     
+    async def _run_shell_async(self, query: str) -> dict:
+        """
+        Asks the LLM for a single linux command solving the query and runs it.
+        
+        Args:
+            query: The task to solve.
+            
+        Returns:
+            A dictionary containing the command, its stdout, stderr and return code,
+            and a success flag that is False only if the command could not be run.
+        """
+        self.logger.info(f"Running CodeAgent with query: {query[:50]}...")
+        prompt = self.prompt_template.format(query=query)
+        
+        response = await self.query_llm(prompt)
+        linux_cmd = extract_xml(response, "code")
+        self.logger.info(f"Received command from LLM: {linux_cmd}")
+        
+        # Empty commands are rejected by _execute_linux_command
+        result = _RESULT_TEMPLATE.copy()
+        result["linux_cmd"] = linux_cmd
+        try:
+            self.logger.info(f"Executing command: {linux_cmd}")
+            run_result = await self._execute_linux_command(linux_cmd)
+            self.logger.info(f"Command execution completed with return code: {run_result['returncode']}")
+            
+            if run_result["returncode"] != 0:
+                self.logger.warning(f"Command failed with stderr: {run_result['stderr']}")
+            
+            result.update(run_result)
+            result["result"] = run_result
+        except Exception as e:
+            self.logger.error(f"Error executing command: {str(e)}", exc_info=True)
+            result.update(success=False, error=str(e), stderr=str(e), returncode=1)
+        return result
+    
+    async def run_batch_async(
+        self, tasks: List[str], max_concurrency: int = 4, checkpoint_path: Optional[str] = None
+    ) -> List[dict]:
+        """
+        Runs several independent tasks on one event loop.
+        
+        Args:
+            tasks: The tasks to solve.
+            max_concurrency: Maximum number of tasks in flight at once.
+            checkpoint_path: JSONL file that each finished task is appended to as it
+                completes. Tasks already recorded there as succeeded are not run
+                again, so an interrupted batch resumes where it stopped.
+            
+        Returns:
+            The results of `run_async`, in the same order as `tasks`. Repeated
+            tasks are run once and share the same result. A task that raised gets
+            `{"success": False, "error": ...}` instead, without stopping the others.
+        """
+        # Deduplicate before spawning anything so repeated tasks cost no LLM calls
+        unique_tasks = list(dict.fromkeys(tasks))
+        results_by_task = self._load_checkpoint(checkpoint_path) if checkpoint_path else {}
+        pending_tasks = [task for task in unique_tasks if task not in results_by_task]
+        self.logger.info(
+            f"Running batch of {len(tasks)} tasks ({len(pending_tasks)} to run) with concurrency {max_concurrency}"
+        )
+        semaphore = asyncio.Semaphore(max_concurrency)
+        checkpoint = open(checkpoint_path, "a") if checkpoint_path else None
+        
+        async def bounded(task: str) -> dict:
+            async with semaphore:
+                try:
+                    result = await self.run_async(task)
+                except Exception as e:
+                    self.logger.error(f"Task failed in batch: {task[:50]}...: {str(e)}", exc_info=True)
+                    result = {"success": False, "error": str(e)}
+            if checkpoint is not None:
+                checkpoint.write(json.dumps({"task": task, "result": result}) + "\n")
+                checkpoint.flush()
+            return result
+        
+        try:
+            # Failures are turned into results above, so every task finishes and
+            # writes its row before the checkpoint is closed
+            pending_results = await asyncio.gather(
+                *[bounded(task) for task in pending_tasks], return_exceptions=True
+            )
+        finally:
+            if checkpoint is not None:
+                checkpoint.close()
+        for task, result in zip(pending_tasks, pending_results):
+            if isinstance(result, BaseException):
+                result = {"success": False, "error": str(result)}
+            results_by_task[task] = result
+        return [results_by_task[task] for task in tasks]
+    
+    def _load_checkpoint(self, checkpoint_path: str) -> Dict[str, Dict[str, Any]]:
+        """
+        Reads the results recorded by an earlier run of `run_batch_async`.
+        
+        Args:
+            checkpoint_path: The JSONL checkpoint file.
+            
+        Returns:
+            A dictionary mapping each recorded task to its result; empty if the file does not exist.
+            Tasks recorded as failed with an error are left out, so they are retried.
+        """
+        results_by_task: Dict[str, Dict[str, Any]] = {}
+        if not os.path.exists(checkpoint_path):
+            return results_by_task
+        with open(checkpoint_path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A line cut short by a crash; that task simply runs again
+                    self.logger.warning(f"Skipping malformed line in checkpoint {checkpoint_path}")
+                    continue
+                result = record["result"]
+                if "error" in result and not result.get("success", True):
+                    results_by_task.pop(record["task"], None)
+                    continue
+                results_by_task[record["task"]] = result
+        self.logger.info(f"Loaded {len(results_by_task)} finished tasks from {checkpoint_path}")
+        return results_by_task
+    
     def extract_final_answer(self, observation: str) -> str:
         """
         Extracts the final answer from the observation.
@@ -64,11 +329,11 @@ class CodeAgent(BaseAgent):
         Returns:
             The extracted final answer, or None if no final answer is found.
         """
-        self.logger.debug(f"Extracting final answer from: {observation[:100]}...")
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug("Extracting final answer from: %s...", observation[:100])
         
         # Try to match "Final answer: <answer>" pattern
-        final_answer_pattern = r"Final answer: (.*?)(?:\n|$)"
-        match = re.search(final_answer_pattern, observation, re.IGNORECASE)
+        match = _FINAL_ANSWER_RE.search(observation)
         
         if match:
             final_answer = match.group(1).strip()
@@ -93,29 +358,31 @@ class CodeAgent(BaseAgent):
         Returns:
             The extracted code.
         """
-        self.logger.debug(f"Extracting code from: {code_blob[:100]}...")
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug("Extracting code from: %s...", code_blob[:100])
         
         # Try to extract code between ```py and ``` or ```python and ```
-        pattern = r"```(?:py|python)?\n(.*?)\n```"
-        matches = re.findall(pattern, code_blob, re.DOTALL)
+        matches = _CODE_BLOCK_RE.findall(code_blob)
         
         if matches:
             extracted_code = "\n\n".join(match.strip() for match in matches)
-            self.logger.debug(f"Extracted code: {extracted_code[:100]}...")
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug("Extracted code: %s...", extracted_code[:100])
             return extracted_code
         
         # If no code blocks found, try to extract code after "Code:" or "code:"
-        code_pattern = r"(?:Code:|code:)\s*\n(.*?)(?:\n\s*(?:Observation:|<end_code>|$))"
-        code_matches = re.findall(code_pattern, code_blob, re.DOTALL)
+        code_matches = _CODE_PREFIX_RE.findall(code_blob)
         
         if code_matches:
             extracted_code = "\n\n".join(match.strip() for match in code_matches)
-            self.logger.debug(f"Extracted code after 'Code:': {extracted_code[:100]}...")
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug("Extracted code after 'Code:': %s...", extracted_code[:100])
             return extracted_code
             
-        # If still no code found, try to parse the entire response as code
+        # If still no code found, try to parse the entire response as code. The
+        # runner compiles through the same cache, so a valid response is parsed once
         try:
-            ast.parse(code_blob)
+            compile_code(code_blob)
             self.logger.debug("Entire response parsed as code")
             return code_blob
         except SyntaxError:
@@ -125,12 +392,13 @@ class CodeAgent(BaseAgent):
         self.logger.warning(f"No code found in response: {code_blob}")
         return None
     
-    def get_observation(self, codes: str) -> str:
+    def get_observation(self, codes: str, namespace: Optional[dict] = None) -> str:
         """
         Gets the observation from running the code.
         
         Args:
             codes: The code to run.
+            namespace: Global namespace shared by the steps of one task.
             
         Returns:
             The observation from running the code.
@@ -139,24 +407,26 @@ class CodeAgent(BaseAgent):
             return "No valid code found in the response."
             
         try:
-            result = self.python_runner.run({"code": codes})
+            result = self.python_runner.run({"code": codes}, namespace)
             return result.get("output", "No output from code execution.")
         except Exception as e:
             error_msg = f"Error running code: {str(e)}"
             self.logger.error(error_msg, exc_info=True)
             return error_msg
     
-    def query_llm(self, prompt: str) -> str:
-        # model_id = "gpt-3.5-turbo"
-        model_id = 'qwen2.5:1.5b'
-        self.logger.info(f"Querying LLM with model: {model_id}")
+    async def query_llm(self, prompt: str) -> str:
+        self.logger.info(f"Querying LLM with model: {self.model_id}")
         # self.logger.debug(f"LLM prompt: {prompt[:100]}...")
         
-        response = llm_call(prompt=prompt, model=model_id)
-        self.logger.debug(f"Raw LLM response: {response[:100]}...")
+        if self.enable_cache:
+            response = await _llm_cached(self.model_id, prompt)
+        else:
+            response = await get_llm_batcher(self.model_id).submit(prompt)
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug("Raw LLM response: %s...", response[:100])
         return response
     
-    def _execute_linux_command(self, command: str) -> dict:
+    async def _execute_linux_command(self, command: str) -> dict:
         """
         Execute a Linux command and return the output and error if any.
         
@@ -164,33 +434,130 @@ class CodeAgent(BaseAgent):
             command: The Linux command to execute
             
         Returns:
-            A dictionary containing stdout, stderr, and return code
+            A dictionary containing stdout, stderr, return code, and whether
+            either stream was truncated to _MAX_OUTPUT_BYTES
         """
         # Handle empty commands
-        if not command or command.strip() == "":
+        if not command or command.isspace():
             self.logger.warning("Attempted to execute empty command")
             return {
                 "stdout": "",
                 "stderr": "Error: Empty command",
-                "returncode": 1
+                "returncode": 1,
+                "truncated": False
             }
             
         try:
-            self.logger.debug(f"Running subprocess: {command}")
-            result = subprocess.run(command, shell=True, capture_output=True, text=True)
-            self.logger.debug(f"Subprocess completed with return code: {result.returncode}")
-            return {
-                "stdout": result.stdout,
-                "stderr": result.stderr,
-                "returncode": result.returncode
-            }
+            self.logger.debug("Running subprocess: %s", command)
+            # Bound the number of live child processes across all agents on this loop
+            async with _get_command_semaphore():
+                proc = None
+                argv = self._split_command(command)
+                if argv is not None:
+                    # Skip the intermediate /bin/sh when there is nothing for it to interpret
+                    try:
+                        proc = await asyncio.create_subprocess_exec(
+                            *argv,
+                            stdout=asyncio.subprocess.PIPE,
+                            stderr=asyncio.subprocess.PIPE
+                        )
+                    except (FileNotFoundError, PermissionError):
+                        # Let the shell report missing programs the usual way
+                        self.logger.debug("Direct exec failed, falling back to shell: %s", argv[0])
+                if proc is None:
+                    proc = await asyncio.create_subprocess_shell(
+                        command,
+                        stdout=asyncio.subprocess.PIPE,
+                        stderr=asyncio.subprocess.PIPE
+                    )
+                # Both pipes were requested above, so the streams are always set
+                assert proc.stdout is not None and proc.stderr is not None
+                # Drain both pipes concurrently so neither can fill up and stall the process
+                (stdout, stdout_truncated), (stderr, stderr_truncated) = await asyncio.gather(
+                    self._read_stream(proc.stdout),
+                    self._read_stream(proc.stderr)
+                )
+                await proc.wait()
+                self.logger.debug("Subprocess completed with return code: %s", proc.returncode)
+                return {
+                    "stdout": stdout,
+                    "stderr": stderr,
+                    "returncode": proc.returncode,
+                    "truncated": stdout_truncated or stderr_truncated
+                }
         except Exception as e:
             self.logger.error(f"Exception in subprocess: {str(e)}", exc_info=True)
             # Re-raise the exception to be handled by the caller
             raise e 
     
+    def _split_command(self, command: str) -> Optional[List[str]]:
+        """
+        Split a command into argv if it can be run without a shell.
+        
+        Args:
+            command: The Linux command to split
+            
+        Returns:
+            The argument list, or None if the command needs shell features
+        """
+        if any(c in _SHELL_METACHARS for c in command):
+            return None
+        try:
+            argv = shlex.split(command)
+        except ValueError:
+            # Unbalanced quotes; let the shell produce the error message
+            return None
+        if not argv or argv[0] in _SHELL_BUILTINS:
+            return None
+        return argv
+    
+    async def _read_stream(self, stream: asyncio.StreamReader) -> tuple:
+        """
+        Read a subprocess stream in fixed-size chunks, keeping at most _MAX_OUTPUT_BYTES.
+        
+        Args:
+            stream: The stdout or stderr stream of the subprocess
+            
+        Returns:
+            A tuple of the decoded output and whether it was truncated
+        """
+        buf = bytearray()
+        truncated = False
+        while True:
+            chunk = await stream.read(_READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            remaining = _MAX_OUTPUT_BYTES - len(buf)
+            if len(chunk) > remaining:
+                truncated = True
+            if remaining > 0:
+                buf.extend(chunk[:remaining])
+        if truncated:
+            self.logger.warning(f"Subprocess output truncated to {_MAX_OUTPUT_BYTES} bytes")
+        return bytes(buf).decode("utf-8", errors="replace"), truncated
+    
 
 if __name__ == "__main__":
-    agent = CodeAgent(tools=[])
-    result = agent.run("what's 5677*325343-4343*4/223?")
-    print(result)
\ No newline at end of file
+    import argparse
+    parser = argparse.ArgumentParser(description="Run the CodeAgent on one or more tasks")
+    parser.add_argument("--tasks-file", help="File with one task per line, run concurrently")
+    parser.add_argument("--concurrency", type=int, default=4, help="Maximum tasks in flight")
+    parser.add_argument("--mode", choices=["python", "shell"], default="python", help="How tasks are solved")
+    parser.add_argument("--checkpoint", help="JSONL file recording finished tasks, used to resume a batch")
+    args = parser.parse_args()
+
+    agent = CodeAgent(tools=[], mode=args.mode)
+    if args.tasks_file:
+        with open(args.tasks_file) as f:
+            tasks = [line.strip() for line in f if line.strip()]
+        async def run_batch() -> list:
+            try:
+                return await agent.run_batch_async(tasks, args.concurrency, args.checkpoint)
+            finally:
+                await close_async_clients()
+        
+        for result in asyncio.run(run_batch()):
+            print(result)
+    else:
+        result = agent.run("what's 5677*325343-4343*4/223?")
+        print(result)
\ No newline at end of file
@@ -1,10 +1,8 @@
 from abc import ABC, abstractmethod
-from src.utils.logging_utils import get_logger
+from src.utils.logging_utils import ClassLoggerMixin
 
-class BaseModel(ABC):
+class BaseModel(ClassLoggerMixin, ABC):
     def __init__(self):
-        # Set up logger
-        self.logger = get_logger(f"{self.__class__.__module__}.{self.__class__.__name__}")
         self.logger.info(f"Initialized {self.__class__.__name__}")
     
     @abstractmethod
@@ -1,11 +1,7 @@
 from abc import ABC, abstractmethod
-from src.utils.logging_utils import get_logger
+from src.utils.logging_utils import ClassLoggerMixin
 from typing import List
-class BaseTool(ABC):
-    # Set up logger
-    logger = get_logger(f"{__module__}.{__name__}")
-    logger.info(f"Initialized {__name__}")
-    
+class BaseTool(ClassLoggerMixin, ABC):
     name: str
     description: str
     inputs: List[str]
@@ -1,6 +1,12 @@
-from openai import OpenAI
-import re
-from src.utils.logging_utils import get_logger
+from openai import AsyncOpenAI, OpenAI
+import asyncio
+import atexit
+import httpx
+import json
+import weakref
+from typing import Any, Dict, List, Optional, Set
+from src.utils.llm_cache import LLMCache
+from src.utils.logging_utils import PROJECT_ROOT, get_logger
 from dotenv import load_dotenv
 import os
 
@@ -19,6 +25,9 @@ try:
     if LANGFUSE_PUBLIC_KEY and LANGFUSE_SECRET_KEY:
         langfuse = Langfuse()
         LANGFUSE_ENABLED = True
+        # Events are sent in the background as they are recorded; flush once on
+        # exit so the last batch is not lost, rather than after every call
+        atexit.register(langfuse.flush)
         logger.info("Langfuse tracking enabled")
     else:
         LANGFUSE_ENABLED = False
@@ -27,7 +36,169 @@ except ImportError:
     LANGFUSE_ENABLED = False
     logger.info("Langfuse tracking disabled: package not installed")
 
-def llm_call(prompt: str, system_prompt: str = "", model="gpt-3.5-turbo") -> str:
+# Checked on every call, so a set for constant-time membership
+OPENAI_MODELS = frozenset({
+    'o3-mini',
+    'gpt-3.5-turbo',
+    'gpt-4o', 'gpt-4o-mini', 'gpt-4o-2024-08-06', 
+    'gpt-4o-2024-05-13', 'gpt-4o-2024-02-15',
+})
+
+LOCAL_API_BASE = 'http://localhost:11434/v1/'
+# LOCAL_API_BASE = 'http://34.240.68.65:80/v1'
+# Upper bound on open connections per endpoint for the async clients
+MAX_CONNECTIONS = 32
+# Marker the agent writes itself after running code; generation is cut there
+STOP_MARKER = "Observation:"
+# Retries on 429, 5xx and timeouts; the SDK backs off exponentially with jitter
+# and honours Retry-After
+MAX_RETRIES = 5
+
+# Opt-in persistent response cache: set LLM_CACHE=1 to reuse responses to identical
+# requests across runs, and LLM_CACHE_TTL to expire them after that many seconds.
+# Only useful when the model is expected to answer deterministically.
+def _log_cache_stats(cache: LLMCache) -> None:
+    """
+    Logs how many requests the response cache answered, at interpreter exit.
+    """
+    logger.info(f"LLM response cache: {cache.hits} hits, {cache.misses} misses")
+
+
+if os.environ.get("LLM_CACHE") == "1":
+    _cache = LLMCache(
+        ttl=float(os.environ["LLM_CACHE_TTL"]) if os.environ.get("LLM_CACHE_TTL") else None,
+        path=os.environ.get("LLM_CACHE_PATH", os.path.join(PROJECT_ROOT, ".cache", "llm_cache.sqlite")),
+    )
+    atexit.register(_log_cache_stats, _cache)
+    _response_cache: Optional[LLMCache] = _cache
+else:
+    _response_cache = None
+
+# Clients keep their connection pool alive, so they are created once and reused
+_clients: Dict[str, OpenAI] = {}
+# Async connection pools are bound to the event loop they were created on
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, AsyncOpenAI]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _client_kwargs(model: str) -> dict:
+    """
+    Returns the OpenAI client arguments for the endpoint serving the given model.
+    """
+    if model not in OPENAI_MODELS:
+        logger.debug(f"Using custom API endpoint for model: {model}")
+        return {"api_key": "EMPTY", "base_url": LOCAL_API_BASE, "max_retries": MAX_RETRIES}
+    logger.debug("Using default OpenAI client")
+    return {"max_retries": MAX_RETRIES}
+
+
+def get_client(model: str) -> OpenAI:
+    """
+    Returns the shared OpenAI client for the endpoint serving the given model.
+
+    Args:
+        model (str): The model the client will be used for.
+
+    Returns:
+        OpenAI: The cached client.
+    """
+    kwargs = _client_kwargs(model)
+    key = kwargs.get("base_url", "openai")
+    if key not in _clients:
+        _clients[key] = OpenAI(**kwargs)
+    return _clients[key]
+
+
+def get_async_client(model: str) -> AsyncOpenAI:
+    """
+    Returns the AsyncOpenAI client for the given model on the running event loop.
+
+    Args:
+        model (str): The model the client will be used for.
+
+    Returns:
+        AsyncOpenAI: The cached client, backed by a pooled keep-alive HTTP client.
+    """
+    kwargs = _client_kwargs(model)
+    key = kwargs.get("base_url", "openai")
+    clients = _async_clients.setdefault(asyncio.get_running_loop(), {})
+    if key not in clients:
+        http_client = httpx.AsyncClient(
+            timeout=60,
+            limits=httpx.Limits(
+                max_connections=MAX_CONNECTIONS,
+                max_keepalive_connections=MAX_CONNECTIONS,
+            ),
+        )
+        clients[key] = AsyncOpenAI(http_client=http_client, **kwargs)
+    return clients[key]
+
+
+async def close_async_clients() -> None:
+    """
+    Closes the async clients created on the running event loop.
+
+    Call this before the loop shuts down so pooled connections are released cleanly.
+    """
+    clients = _async_clients.pop(asyncio.get_running_loop(), {})
+    for client in clients.values():
+        await client.close()
+    if clients:
+        logger.debug(f"Closed {len(clients)} async LLM clients")
+
+
+def _build_messages(prompt: str, system_prompt: str) -> List[Dict[str, str]]:
+    """
+    Builds the chat messages for a call once, to be shared by the request and tracing.
+    """
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": prompt}
+    ]
+
+
+def _start_generation(prompt: str, messages: List[Dict[str, str]], model: str) -> Optional[Any]:
+    """
+    Starts a Langfuse generation for the call, or returns None if tracking is off.
+    """
+    if not LANGFUSE_ENABLED:
+        return None
+    try:
+        return langfuse.generation(
+            name=f"llm_call_{model}",
+            input=prompt,
+            model=model,
+            messages=messages
+        )
+    except Exception as e:
+        logger.warning(f"Failed to initialize Langfuse tracking: {str(e)}")
+        return None
+
+
+def _end_generation(generation: Optional[Any], response: str) -> None:
+    """
+    Records the response on the Langfuse generation, if one was started.
+    """
+    if not (LANGFUSE_ENABLED and generation):
+        return
+    try:
+        # Add metadata to the generation
+        # generation.update(
+        #     metadata={
+        #         "model": model,
+        #         "prompt_length": len(prompt),
+        #         "response_length": len(response),
+        #         "system_prompt_length": len(system_prompt),
+        #         "timestamp": datetime.datetime.now().isoformat()
+        #     }
+        # )
+        generation.end(output=response)
+    except Exception as e:
+        logger.warning(f"Failed to record response in Langfuse: {str(e)}")
+
+
+def llm_call(prompt: str, system_prompt: str = "", model="gpt-3.5-turbo", trace: bool = True) -> str:
     """
     Calls the model with the given prompt and returns the response.
 
@@ -35,6 +206,8 @@ def llm_call(prompt: str, system_prompt: str = "", model="gpt-3.5-turbo") -> str
         prompt (str): The user prompt to send to the model.
         system_prompt (str, optional): The system prompt to send to the model. Defaults to "".
         model (str, optional): The model to use for the call. Defaults to "gpt-3.5-turbo".
+        trace (bool, optional): Whether to record the call in Langfuse. Pass False for
+            bookkeeping calls that should not pay for tracing. Defaults to True.
 
     Returns:
         str: The response from the language model.
@@ -43,78 +216,33 @@ def llm_call(prompt: str, system_prompt: str = "", model="gpt-3.5-turbo") -> str
     logger.debug(f"Prompt: {prompt[:100]}...")
     logger.debug(f"System prompt: {system_prompt[:100]}...")
     
-    # if model in ['qwen2.5:7b']
-    open_ai_model_name_list = [
-        'o3-mini',
-        'gpt-3.5-turbo',
-        'gpt-4o', 'gpt-4o-mini', 'gpt-4o-2024-08-06', 
-        'gpt-4o-2024-05-13', 'gpt-4o-2024-02-15', 'gpt-4o-2024-02-15', 'gpt-4o-2024-02-15', 
-        'gpt-4o-2024-02-15', ]
-    
-    if model not in open_ai_model_name_list:
-        logger.debug(f"Using custom API endpoint for model: {model}")
-        openai_api_key = "EMPTY"
-        openai_api_base = 'http://localhost:11434/v1/'
-        # openai_api_base = 'http://34.240.68.65:80/v1'
-        client = OpenAI(
-            api_key=openai_api_key,
-            base_url=openai_api_base,
-        )
-    else:
-        logger.debug("Using default OpenAI client")
-        client = OpenAI()
+    client = get_client(model)
 
     try:
         logger.debug("Sending request to LLM API")
         
+        messages = _build_messages(prompt, system_prompt)
+        if _response_cache is not None:
+            cached = _response_cache.get(model, messages)
+            if cached is not None:
+                return cached
+        
         # Initialize Langfuse tracking if enabled
-        generation = None
-        if LANGFUSE_ENABLED:
-            try:
-                generation = langfuse.generation(
-                    name=f"llm_call_{model}",
-                    input=prompt,
-                    model=model,
-                    messages=[
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": prompt}
-                    ]
-                )
-            except Exception as e:
-                logger.warning(f"Failed to initialize Langfuse tracking: {str(e)}")
+        generation = _start_generation(prompt, messages, model) if trace else None
         
         # Make the actual API call
         completion = client.chat.completions.create(
             model=model,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
+            messages=messages,
             stop=["Observation:"]  # Let's stop before any actual function is called
         )
         
         response = completion.choices[0].message.content
         
         # Record the response in Langfuse if tracking is enabled
-        if LANGFUSE_ENABLED and generation:
-            try:
-                # Add metadata to the generation
-                # generation.update(
-                #     metadata={
-                #         "model": model,
-                #         "prompt_length": len(prompt),
-                #         "response_length": len(response),
-                #         "system_prompt_length": len(system_prompt),
-                #         "timestamp": datetime.datetime.now().isoformat()
-                #     }
-                # )
-                generation.end(output=response)
-                langfuse.flush()
-            except Exception as e:
-                logger.warning(f"Failed to record response in Langfuse: {str(e)}")
+        _end_generation(generation, response)
+        if _response_cache is not None:
+            _response_cache.set(model, messages, response)
         
         logger.debug(f"Received response from LLM: {response[:100]}...")
         return response
@@ -123,6 +251,273 @@ def llm_call(prompt: str, system_prompt: str = "", model="gpt-3.5-turbo") -> str
         raise
 
 
+async def llm_call_async(
+    prompt: str, system_prompt: str = "", model="gpt-3.5-turbo", trace: bool = True
+) -> str:
+    """
+    Async variant of `llm_call` that reuses a pooled connection per endpoint.
+
+    The response is streamed and the stream is closed as soon as the stop marker
+    appears, for endpoints that do not honour `stop` themselves.
+
+    Args:
+        prompt (str): The user prompt to send to the model.
+        system_prompt (str, optional): The system prompt to send to the model. Defaults to "".
+        model (str, optional): The model to use for the call. Defaults to "gpt-3.5-turbo".
+        trace (bool, optional): Whether to record the call in Langfuse. Pass False for
+            bookkeeping calls that should not pay for tracing. Defaults to True.
+
+    Returns:
+        str: The response from the language model.
+    """
+    logger.info(f"Calling LLM asynchronously with model: {model}")
+    logger.debug(f"Prompt: {prompt[:100]}...")
+    
+    client = get_async_client(model)
+
+    try:
+        messages = _build_messages(prompt, system_prompt)
+        if _response_cache is not None:
+            cached = _response_cache.get(model, messages)
+            if cached is not None:
+                return cached
+        generation = _start_generation(prompt, messages, model) if trace else None
+        stream = await client.chat.completions.create(
+            model=model,
+            messages=messages,
+            stop=[STOP_MARKER],  # Let's stop before any actual function is called
+            stream=True,
+        )
+        chunks = []
+        # Only the end of the text so far is searched, since the marker may straddle two chunks
+        tail = ""
+        try:
+            async for chunk in stream:
+                if not chunk.choices or not chunk.choices[0].delta.content:
+                    continue
+                delta = chunk.choices[0].delta.content
+                chunks.append(delta)
+                tail = tail[-len(STOP_MARKER):] + delta
+                if STOP_MARKER in tail:
+                    break
+        finally:
+            await stream.close()
+        response = "".join(chunks).split(STOP_MARKER, 1)[0]
+        _end_generation(generation, response)
+        if _response_cache is not None:
+            _response_cache.set(model, messages, response)
+        
+        logger.debug(f"Received response from LLM: {response[:100]}...")
+        return response
+    except Exception as e:
+        logger.error(f"Error calling LLM: {str(e)}", exc_info=True)
+        raise
+
+
+async def llm_call_batch(
+    prompts: List[str], system_prompt: str = "", model="gpt-3.5-turbo", trace: bool = True
+) -> list:
+    """
+    Calls the model once per prompt concurrently and returns the responses in order.
+
+    The chat completions endpoint has no multi-prompt request, so the batch is
+    dispatched as concurrent calls over the shared async connection pool.
+
+    Args:
+        prompts (List[str]): The user prompts to send to the model.
+        system_prompt (str, optional): The system prompt shared by all prompts. Defaults to "".
+        model (str, optional): The model to use for the calls. Defaults to "gpt-3.5-turbo".
+        trace (bool, optional): Whether to record the calls in Langfuse. Defaults to True.
+
+    Returns:
+        list: The responses, or the raised exception for prompts whose call failed.
+    """
+    logger.info(f"Calling LLM with a batch of {len(prompts)} prompts, model: {model}")
+    return await asyncio.gather(
+        *[llm_call_async(prompt, system_prompt, model, trace=trace) for prompt in prompts],
+        return_exceptions=True
+    )
+
+
+async def llm_call_batch_offline(
+    prompts: List[str],
+    system_prompt: str = "",
+    model="gpt-3.5-turbo",
+    poll_interval: float = 30.0
+) -> List[Optional[str]]:
+    """
+    Runs the prompts through the OpenAI Batch API and returns the responses in order.
+
+    Batch jobs are billed at a discount but may take up to 24 hours, so this is meant
+    for offline runs over many prompts; use `llm_call_batch` for interactive work.
+
+    Args:
+        prompts (List[str]): The user prompts to send to the model.
+        system_prompt (str, optional): The system prompt shared by all prompts. Defaults to "".
+        model (str, optional): The OpenAI model to use. Defaults to "gpt-3.5-turbo".
+        poll_interval (float, optional): Seconds between batch status checks. Defaults to 30.
+
+    Returns:
+        List[Optional[str]]: The responses, with None for requests that failed inside the batch.
+    """
+    if model not in OPENAI_MODELS:
+        raise ValueError(f"The Batch API is only available for OpenAI models, got: {model}")
+
+    client = get_async_client(model)
+    lines = [
+        json.dumps({
+            "custom_id": str(i),
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {
+                "model": model,
+                "messages": _build_messages(prompt, system_prompt),
+                "stop": ["Observation:"]
+            }
+        })
+        for i, prompt in enumerate(prompts)
+    ]
+    batch_file = await client.files.create(
+        file=("batch.jsonl", "\n".join(lines).encode()), purpose="batch"
+    )
+    batch = await client.batches.create(
+        input_file_id=batch_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h"
+    )
+    logger.info(f"Submitted batch {batch.id} with {len(prompts)} prompts, model: {model}")
+
+    while batch.status not in ("completed", "failed", "expired", "cancelled"):
+        await asyncio.sleep(poll_interval)
+        batch = await client.batches.retrieve(batch.id)
+        logger.debug(f"Batch {batch.id} status: {batch.status}")
+
+    if batch.status != "completed" or not batch.output_file_id:
+        raise RuntimeError(f"Batch {batch.id} ended with status: {batch.status}")
+
+    output = await client.files.content(batch.output_file_id)
+    responses: List[Optional[str]] = [None] * len(prompts)
+    for line in output.text.splitlines():
+        if not line:
+            continue
+        item = json.loads(line)
+        body = (item.get("response") or {}).get("body") or {}
+        choices = body.get("choices")
+        if choices:
+            responses[int(item["custom_id"])] = choices[0]["message"]["content"]
+        else:
+            logger.warning(f"Request {item.get('custom_id')} in batch {batch.id} failed: {item.get('error')}")
+    return responses
+
+
+class LLMBatcher:
+    """
+    Coalesces prompts submitted within a short window into a single `llm_call_batch`.
+
+    A background task drains up to `max_batch_size` queued prompts, waiting at most
+    `max_latency` seconds after the first one arrives, then dispatches the batch in its
+    own task and goes straight back to the queue, so prompts arriving while a batch is
+    in flight are not held behind its slowest call.
+    """
+
+    def __init__(self, model: str, max_batch_size: int = 8, max_latency: float = 0.02) -> None:
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # Strong references to in-flight batches, which the loop only holds weakly
+        self._dispatches: Set[asyncio.Task] = set()
+
+    async def submit(self, prompt: str) -> str:
+        """
+        Queues a prompt for the next batch and waits for its response.
+
+        Args:
+            prompt (str): The user prompt to send to the model.
+
+        Returns:
+            str: The response from the language model.
+        """
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future[str] = loop.create_future()
+        await self._ensure_started(loop).put((prompt, future))
+        return await future
+
+    def _ensure_started(self, loop: asyncio.AbstractEventLoop) -> asyncio.Queue:
+        """
+        Returns the queue the worker on `loop` reads from, starting the worker if needed.
+
+        Args:
+            loop (asyncio.AbstractEventLoop): The running event loop.
+
+        Returns:
+            asyncio.Queue: The queue to put (prompt, future) pairs on.
+        """
+        # Queues and tasks are bound to a loop, so restart the worker on a new one
+        if (
+            self._queue is None
+            or self._loop is not loop
+            or self._worker is None
+            or self._worker.done()
+        ):
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run(self._queue))
+        return self._queue
+
+    async def _run(self, queue: asyncio.Queue) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await queue.get()]
+            deadline = loop.time() + self.max_latency
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            logger.debug(f"Dispatching batch of {len(batch)} prompts to {self.model}")
+            dispatch = loop.create_task(self._dispatch(batch))
+            self._dispatches.add(dispatch)
+            dispatch.add_done_callback(self._dispatches.discard)
+
+    async def _dispatch(self, batch: list) -> None:
+        try:
+            responses = await llm_call_batch([prompt for prompt, _ in batch], model=self.model)
+        except Exception as e:
+            responses = [e] * len(batch)
+        for (_, future), response in zip(batch, responses):
+            if future.done():
+                continue
+            if isinstance(response, BaseException):
+                future.set_exception(response)
+            else:
+                future.set_result(response)
+
+
+_batchers: Dict[str, LLMBatcher] = {}
+
+
+def get_llm_batcher(model: str) -> LLMBatcher:
+    """
+    Returns the shared LLMBatcher for the given model, creating it on first use.
+
+    Args:
+        model (str): The model the batcher sends requests to.
+
+    Returns:
+        LLMBatcher: The batcher for the model.
+    """
+    if model not in _batchers:
+        _batchers[model] = LLMBatcher(model)
+    return _batchers[model]
+
+
 def extract_xml(text: str, tag: str) -> str:
     """
     Extracts the content of the specified XML tag from the given text. Used for parsing structured responses 
@@ -135,8 +530,12 @@ def extract_xml(text: str, tag: str) -> str:
         str: The content of the specified XML tag, or an empty string if the tag is not found.
     """
     logger.debug(f"Extracting XML tag '{tag}' from text")
-    match = re.search(f'<{tag}>(.*?)</{tag}>', text, re.DOTALL)
-    result = match.group(1) if match else ""
+    # Plain substring scans find the same first <tag>...</tag> span as a
+    # non-greedy regex, without building or looking up a pattern per call
+    open_tag = f"<{tag}>"
+    start = text.find(open_tag)
+    end = text.find(f"</{tag}>", start + len(open_tag)) if start != -1 else -1
+    result = text[start + len(open_tag):end] if end != -1 else ""
     if not result:
         logger.warning(f"Tag '{tag}' not found in text")
     else:
@@ -156,4 +156,11 @@ prompt_template = """
   10. Don't give up! You're in charge of solving the task, not providing directions to solve it.
 
   Now Begin! If you solve the task correctly, you will receive a reward of $1,000,000: 
-"""
\ No newline at end of file
+"""
+
+shell_prompt_template = """
+  You are a coding and linux command experts. You are given a task to write linux command to solve the problem.
+  {query}
+  You response should be in the following format:
+  <code>your linux command</code>
+"""
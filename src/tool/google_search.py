@@ -1,8 +1,29 @@
 from src.base_class.base_tool import BaseTool
 from googlesearch import search
 from typing import Dict, Any, List, Optional
+import asyncio
 import time
 import random
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+def _normalize_url(url: str) -> str:
+    """
+    Normalize a URL so that equivalent links compare equal.
+    
+    Lowercases the scheme and host, drops the fragment, `utm_*` tracking
+    parameters and any trailing slash.
+    
+    Args:
+        url: The URL to normalize
+        
+    Returns:
+        The normalized URL
+    """
+    parts = urlsplit(url)
+    query = urlencode([(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                       if not k.lower().startswith("utm_")])
+    path = parts.path.rstrip("/")
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, query, ""))
 
 class GoogleSearch(BaseTool):
     name = "google_search"
@@ -37,19 +58,58 @@ class GoogleSearch(BaseTool):
                 "results": []
             }
         
-        try:
-            # Add a small random delay to avoid rate limiting
-            time.sleep(random.uniform(0.5, 1.5))
+        # Add a small random delay to avoid rate limiting
+        time.sleep(random.uniform(0.5, 1.5))
+        return self._search(query, num_results)
+    
+    async def run_async(self, query: str, num_results: int = 10) -> Dict[str, Any]:
+        """
+        Async variant of `run` for use inside an event loop.
+        
+        The rate-limit delay is awaited rather than slept, and the blocking
+        googlesearch request runs in a worker thread, so several searches can be
+        issued at once with `asyncio.gather`.
+        
+        Args:
+            query: The search query
+            num_results: Number of results to return (default: 10)
             
+        Returns:
+            The same results as `run`
+        """
+        if not query:
+            # Returns the error immediately, without a delay or a request
+            return self.run(query, num_results)
+        await asyncio.sleep(random.uniform(0.5, 1.5))
+        return await asyncio.to_thread(self._search, query, num_results)
+    
+    def _search(self, query: str, num_results: int) -> List[Dict[str, str]]:
+        """
+        Run the search request and build the result list, without any delay.
+        
+        Args:
+            query: The search query
+            num_results: Number of results to return
+            
+        Returns:
+            The search results, or a single error entry if the search failed
+        """
+        try:
             # Use the googlesearch package to perform the search
             search_results = search(
                 query,
                 num_results=num_results,
             )
             
-            # Process the results
+            # Process the results, skipping links that only differ by tracking
+            # parameters, fragment or trailing slash
             results = []
+            seen = set()
             for url in search_results:
+                normalized = _normalize_url(url)
+                if normalized in seen:
+                    continue
+                seen.add(normalized)
                 # The googlesearch package only returns URLs, not titles or snippets
                 results.append({
                     "title": self._extract_title_from_url(url),
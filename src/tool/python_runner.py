@@ -1,9 +1,38 @@
 from src.base_class.base_tool import BaseTool
-import sys
+from typing import Any, Optional
+import builtins
+import contextlib
+import functools
+import signal
 import io
+import threading
+import types
+
+
+def final_answer(answer: Any) -> None:
+    print(f"Final answer: {answer}")
+
+
+@functools.lru_cache(maxsize=256)
+def compile_code(code: str) -> types.CodeType:
+    """
+    Compile a snippet once; code objects are immutable, so repeated snippets reuse it.
+
+    Args:
+        code: The Python source to compile.
+
+    Returns:
+        The compiled code object; raises SyntaxError if the code is not valid Python.
+    """
+    return compile(code, "<string>", "exec")
+
+
+def _raise_timeout(signum: int, frame: Optional[types.FrameType]) -> None:
+    raise TimeoutError("Code execution timed out")
+
 
 class PythonRunner(BaseTool):
-    def __init__(self):
+    def __init__(self, timeout: Optional[float] = None):
         super().__init__()
         self.name = "python_runner"
         self.description = "Run a python script"
@@ -13,14 +42,28 @@ class PythonRunner(BaseTool):
                 'description': 'The python code to run'
             }
         }
+        # Wall-clock limit in seconds; only enforced on the main thread, where SIGALRM is delivered
+        self.timeout = timeout
         self.logger.debug(f"PythonRunner initialized with parameters: {self.parameters}")
     
-    def run(self, input: dict) -> dict:
+    def new_namespace(self) -> dict:
+        """
+        Create a fresh global namespace with the predefined helpers.
+        
+        Returns:
+            A dictionary to pass to `run` so variables persist across snippets.
+        """
+        return {"__builtins__": builtins, "final_answer": final_answer}
+    
+    def run(self, input: dict, namespace: Optional[dict] = None) -> dict:
         """
         Run Python code and return the output.
         
         Args:
             input: A dictionary containing the code to run.
+            namespace: Global namespace to run the code in. Reusing the same
+                dictionary keeps variables between calls; by default each call
+                runs in a fresh namespace.
             
         Returns:
             A dictionary containing the output of the code execution.
@@ -30,24 +73,31 @@ class PythonRunner(BaseTool):
             self.logger.error("No code provided to PythonRunner")
             raise ValueError("No code provided")
         
-        predefined_code = """
-def final_answer(answer):
-    print(f"Final answer: {answer}")
-        """
-        code_to_run = predefined_code + "\n" + code
+        if namespace is None:
+            namespace = self.new_namespace()
         
         self.logger.info("Running Python code")
-        self.logger.debug(f"Code to run: {code_to_run[:100]}...")
+        self.logger.debug(f"Code to run: {code[:100]}...")
         
         # Capture stdout
-        old_stdout = sys.stdout
         new_stdout = io.StringIO()
-        sys.stdout = new_stdout
+        
+        timeout = self.timeout
+        use_timer = (
+            timeout is not None
+            and hasattr(signal, "setitimer")
+            and threading.current_thread() is threading.main_thread()
+        )
+        if use_timer and timeout is not None:
+            old_handler = signal.signal(signal.SIGALRM, _raise_timeout)
+            signal.setitimer(signal.ITIMER_REAL, timeout)
         
         try:
             self.logger.debug("Executing code")
-            # Execute the code and capture any print statements
-            exec(code_to_run, {}, {})
+            # Execute the code and capture any print statements; stdout is
+            # restored on the way out even if the code raises or times out
+            with contextlib.redirect_stdout(new_stdout):
+                exec(compile_code(code), namespace)
             # Get the captured output
             output = new_stdout.getvalue()
             self.logger.debug(f"Code execution completed, output: {output[:100]}...")
@@ -57,20 +107,21 @@ def final_answer(answer):
             self.logger.error(error_msg, exc_info=True)
             return {"output": error_msg, "success": False}
         finally:
-            # Restore stdout
-            sys.stdout = old_stdout
-            self.logger.debug("Restored stdout after code execution")
+            if use_timer:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+                signal.signal(signal.SIGALRM, old_handler)
     
-    def forward(self, input: dict) -> dict:
+    def forward(self, input: dict, namespace: Optional[dict] = None) -> dict:
         """
         Forward method to maintain compatibility with other frameworks.
         
         Args:
             input: A dictionary containing the code to run.
+            namespace: Optional global namespace, see `run`.
             
         Returns:
             The result of the run method.
         """
-        return self.run(input)
+        return self.run(input, namespace)
 
     
\ No newline at end of file
@@ -0,0 +1,173 @@
+"""
+Response cache for LLM calls.
+
+This module provides an in-memory LRU cache keyed by a SHA-256 digest of the
+request (model, messages and temperature), with an optional time-to-live and an
+optional SQLite file that persists responses across runs.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from src.utils.logging_utils import get_logger
+
+logger = get_logger("src.utils.llm_cache")
+
+
+class LLMCache:
+    """
+    Exact-match cache of LLM responses.
+
+    Only identical requests hit, so it is safe for deterministic calls; callers
+    that sample with a high temperature should not use it.
+    """
+
+    def __init__(
+        self, max_size: int = 1024, ttl: Optional[float] = None, path: Optional[str] = None
+    ) -> None:
+        """
+        Args:
+            max_size: The maximum number of responses kept; the least recently used is evicted.
+            ttl: Seconds after which an entry expires (default: None, never).
+            path: SQLite file backing the cache (default: None, memory only). Responses
+                written there survive restarts; the in-memory LRU stays in front of it.
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        if path is not None:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            with self._db:
+                # stored_at is wall-clock time, so entries age across restarts
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS responses "
+                    "(key TEXT PRIMARY KEY, stored_at REAL, response TEXT)"
+                )
+                self._db.execute(
+                    "CREATE INDEX IF NOT EXISTS responses_stored_at ON responses (stored_at)"
+                )
+
+    @staticmethod
+    def make_key(
+        model: str, messages: List[Dict[str, str]], temperature: Optional[float] = None
+    ) -> str:
+        """
+        Build the cache key for a request.
+
+        Args:
+            model: The model the request is sent to.
+            messages: The chat messages of the request.
+            temperature: The sampling temperature, if set.
+
+        Returns:
+            The hex SHA-256 digest of the canonical JSON encoding of the request.
+        """
+        payload = json.dumps(
+            {"model": model, "messages": messages, "temperature": temperature}, sort_keys=True
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get(
+        self, model: str, messages: List[Dict[str, str]], temperature: Optional[float] = None
+    ) -> Optional[str]:
+        """
+        Look up the cached response for a request.
+
+        Returns:
+            The cached response, or None on a miss or an expired entry.
+        """
+        key = self.make_key(model, messages, temperature)
+        entry = self._entries.get(key)
+        if entry is not None:
+            stored_at, response = entry
+            if self.ttl is None or time.monotonic() - stored_at <= self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                logger.debug(f"LLM cache hit for model {model}")
+                return response
+            del self._entries[key]
+        loaded = self._load(key)
+        if loaded is None:
+            self.misses += 1
+            return None
+        age, response = loaded
+        # Keep the entry's original age so its TTL is not restarted by the disk hit
+        self._remember(key, response, age)
+        self.hits += 1
+        logger.debug(f"LLM disk cache hit for model {model}")
+        return response
+
+    def set(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        response: str,
+        temperature: Optional[float] = None,
+    ) -> None:
+        """
+        Store the response for a request, evicting the least recently used entry if full.
+        """
+        key = self.make_key(model, messages, temperature)
+        self._remember(key, response)
+        if self._db is not None:
+            now = time.time()
+            with self._db_lock, self._db:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses VALUES (?, ?, ?)", (key, now, response)
+                )
+                if self.ttl is not None:
+                    self._db.execute("DELETE FROM responses WHERE stored_at < ?", (now - self.ttl,))
+
+    def clear(self) -> None:
+        """Remove all cached responses, including those on disk."""
+        self._entries.clear()
+        if self._db is not None:
+            with self._db_lock, self._db:
+                self._db.execute("DELETE FROM responses")
+
+    def _remember(self, key: str, response: str, age: float = 0.0) -> None:
+        """Store a response `age` seconds old in the in-memory LRU, evicting the oldest entry if full."""
+        self._entries[key] = (time.monotonic() - age, response)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def _load(self, key: str) -> Optional[Tuple[float, str]]:
+        """
+        Read a response from the SQLite file, deleting it if it has expired.
+
+        Returns:
+            The entry's age in seconds and the response, or None if absent, expired or memory only.
+        """
+        if self._db is None:
+            return None
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT stored_at, response FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            stored_at, response = row
+            age = max(0.0, time.time() - stored_at)
+            if self.ttl is not None and age > self.ttl:
+                with self._db:
+                    self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                return None
+        return age, response
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -5,11 +5,13 @@ This module provides functions to set up and configure logging for the project.
 It includes functions to create loggers, set log levels, and configure log handlers.
 """
 
+import atexit
 import logging
 import os
+import queue
 import sys
-from logging.handlers import RotatingFileHandler
-from typing import Optional, Union
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Any, Dict, List, Optional, Union
 
 # Get the project root directory
 PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
@@ -29,6 +31,49 @@ DEFAULT_MAX_BYTES = 10 * 1024 * 1024
 # Default number of backup log files
 DEFAULT_BACKUP_COUNT = 5
 
+
+class _RoutedQueueHandler(QueueHandler):
+    """Enqueues records tagged with the logger whose handlers should write them."""
+
+    def __init__(self, log_queue: queue.Queue, route: str) -> None:
+        super().__init__(log_queue)
+        self.route = route
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = super().prepare(record)
+        record.log_route = self.route
+        return record
+
+
+class _HandlerRouter(logging.Handler):
+    """Passes each dequeued record to the console and file handlers of its logger."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.routes: Dict[str, List[logging.Handler]] = {}
+
+    def emit(self, record: logging.LogRecord) -> None:
+        for handler in self.routes.get(getattr(record, "log_route", record.name), ()):
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+
+# One queue and one background thread serve every queued logger
+_log_queue: queue.Queue = queue.Queue(-1)
+_handler_router = _HandlerRouter()
+_queue_listener: Optional[QueueListener] = None
+
+
+def _start_queue_listener() -> None:
+    """Start a listener that writes queued records through the shared router."""
+    global _queue_listener
+    listener = QueueListener(_log_queue, _handler_router)
+    listener.start()
+    _queue_listener = listener
+
+
+_start_queue_listener()
+
 # Create logs directory if it doesn't exist
 if not os.path.exists(DEFAULT_LOG_DIR):
     os.makedirs(DEFAULT_LOG_DIR)
@@ -46,6 +91,7 @@ def setup_logger(
     log_dir: str = DEFAULT_LOG_DIR,
     max_bytes: int = DEFAULT_MAX_BYTES,
     backup_count: int = DEFAULT_BACKUP_COUNT,
+    use_queue: bool = True,
 ) -> logging.Logger:
     """
     Set up a logger with the specified configuration.
@@ -61,6 +107,8 @@ def setup_logger(
         log_dir: The log directory (default: "logs").
         max_bytes: The maximum log file size in bytes (default: 10 MB).
         backup_count: The number of backup log files (default: 5).
+        use_queue: Whether to hand records to a background thread through a queue, so the
+            calling thread never blocks on console or file I/O (default: True).
 
     Returns:
         The configured logger.
@@ -76,15 +124,18 @@ def setup_logger(
     # Remove existing handlers to avoid duplicates
     for handler in logger.handlers[:]:
         logger.removeHandler(handler)
+    for handler in _handler_router.routes.pop(name, []):
+        handler.close()
 
     # Create formatter
     formatter = logging.Formatter(log_format, date_format)
+    handlers: List[logging.Handler] = []
 
     # Add console handler if requested
     if log_to_console:
         console_handler = logging.StreamHandler(sys.stdout)
         console_handler.setFormatter(formatter)
-        logger.addHandler(console_handler)
+        handlers.append(console_handler)
 
     # Add file handler if requested
     if log_to_file:
@@ -107,11 +158,56 @@ def setup_logger(
             backupCount=backup_count,
         )
         file_handler.setFormatter(formatter)
-        logger.addHandler(file_handler)
+        handlers.append(file_handler)
+
+    if use_queue and handlers and _queue_listener is not None:
+        # Logging calls only enqueue the record; the shared listener thread does the I/O
+        _handler_router.routes[name] = handlers
+        logger.addHandler(_RoutedQueueHandler(_log_queue, name))
+    else:
+        for handler in handlers:
+            logger.addHandler(handler)
 
     return logger
 
 
+def flush_logs() -> None:
+    """
+    Write out every record queued so far and keep the background listener running.
+    """
+    global _queue_listener
+    if _queue_listener is not None:
+        # stop() drains the queue; a fresh listener then serves later records
+        _queue_listener.stop()
+        _start_queue_listener()
+
+
+def stop_queue_listener() -> None:
+    """
+    Stop the background log listener, flushing any queued records.
+
+    Loggers that were writing through the queue get their console and file handlers
+    attached directly, so records logged afterwards are still written. This is
+    registered with `atexit`; call `flush_logs` to flush earlier without stopping.
+    """
+    global _queue_listener
+    if _queue_listener is None:
+        return
+    _queue_listener.stop()
+    _queue_listener = None
+    for name, handlers in list(_handler_router.routes.items()):
+        logger = logging.getLogger(name)
+        for handler in logger.handlers[:]:
+            if isinstance(handler, _RoutedQueueHandler):
+                logger.removeHandler(handler)
+        for handler in handlers:
+            logger.addHandler(handler)
+    _handler_router.routes.clear()
+
+
+atexit.register(stop_queue_listener)
+
+
 def get_logger(name: str) -> logging.Logger:
     """
     Get a logger with the specified name.
@@ -133,5 +229,21 @@ def get_logger(name: str) -> logging.Logger:
     return logger
 
 
+class ClassLoggerMixin:
+    """
+    Gives every subclass a `logger` named "<module>.<class>".
+
+    The logger is set up once, when the subclass is defined, instead of on every
+    instantiation. Base classes that mix this in directly get no logger of their own.
+    """
+
+    logger: logging.Logger
+
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+        if ClassLoggerMixin not in cls.__bases__:
+            cls.logger = get_logger(f"{cls.__module__}.{cls.__name__}")
+
+
 # Set up the root logger
 root_logger = setup_logger("hands_on_deep_research") 
\ No newline at end of file
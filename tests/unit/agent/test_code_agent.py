@@ -1,8 +1,13 @@
 import unittest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
+import asyncio
+import os
 import subprocess
-from src.agent.code_agent import CodeAgent
+import tempfile
+import time
+from src.agent.code_agent import CodeAgent, _llm_cache
 from src.base_class.base_tool import BaseTool
+from src.tool.python_runner import compile_code
 
 class TestCodeAgent(unittest.TestCase):
     def setUp(self):
@@ -12,6 +17,7 @@ class TestCodeAgent(unittest.TestCase):
         
         # Initialize the agent with the mock tool
         self.agent = CodeAgent(tools=[self.mock_tool])
+        _llm_cache.clear()
     
     def test_init(self):
         """Test the initialization of the CodeAgent class."""
@@ -25,43 +31,40 @@ class TestCodeAgent(unittest.TestCase):
         agent = CodeAgent(tools=[self.mock_tool], prompt_template=custom_prompt)
         self.assertEqual(agent.prompt_template, custom_prompt)
     
-    @patch('src.agent.code_agent.llm_call')
+    @patch.object(CodeAgent, '_execute_linux_command', new_callable=AsyncMock)
     @patch('src.agent.code_agent.extract_xml')
-    @patch('subprocess.run')
-    def test_run(self, mock_subprocess_run, mock_extract_xml, mock_llm_call):
+    @patch.object(CodeAgent, 'query_llm', new_callable=AsyncMock)
+    def test_run(self, mock_query_llm, mock_extract_xml, mock_execute):
         """Test the run method of the CodeAgent class."""
         # Setup mocks
-        mock_llm_call.return_value = "<code>ls -la</code>"
+        mock_query_llm.return_value = "<code>ls -la</code>"
         mock_extract_xml.return_value = "ls -la"
-        
-        mock_process = MagicMock()
-        mock_process.stdout = "file1\nfile2"
-        mock_process.stderr = ""
-        mock_process.returncode = 0
-        mock_subprocess_run.return_value = mock_process
+        mock_execute.return_value = {"stdout": "file1\nfile2", "stderr": "", "returncode": 0, "truncated": False}
+        agent = CodeAgent(tools=[self.mock_tool], mode="shell")
         
         # Call the method
-        result = self.agent.run("List files in the current directory")
+        result = agent.run("List files in the current directory")
         
         # Assertions
-        mock_llm_call.assert_called_once()
+        mock_query_llm.assert_awaited_once()
         mock_extract_xml.assert_called_once_with("<code>ls -la</code>", "code")
-        mock_subprocess_run.assert_called_once_with("ls -la", shell=True, capture_output=True, text=True)
+        mock_execute.assert_awaited_once_with("ls -la")
         
         self.assertEqual(result["stdout"], "file1\nfile2")
         self.assertEqual(result["stderr"], "")
         self.assertEqual(result["returncode"], 0)
     
-    @patch('src.agent.code_agent.llm_call')
     @patch('src.agent.code_agent.extract_xml')
-    def test_run_with_empty_command(self, mock_extract_xml, mock_llm_call):
+    @patch.object(CodeAgent, 'query_llm', new_callable=AsyncMock)
+    def test_run_with_empty_command(self, mock_query_llm, mock_extract_xml):
         """Test the run method when the LLM returns an empty command."""
         # Setup mocks
-        mock_llm_call.return_value = "<code></code>"
+        mock_query_llm.return_value = "<code></code>"
         mock_extract_xml.return_value = ""
+        agent = CodeAgent(tools=[self.mock_tool], mode="shell")
         
         # Call the method and check if it handles empty commands
-        result = self.agent.run("Generate an empty command")
+        result = agent.run("Generate an empty command")
         
         # Empty command should still be executed but return an error
         self.assertNotEqual(result["returncode"], 0)
@@ -107,10 +110,26 @@ class TestCodeAgent(unittest.TestCase):
         # Should return an empty string if no code tag is found
         self.assertEqual(result, "")
     
+    @patch('src.agent.code_agent.get_llm_batcher')
+    def test_query_llm_caches_identical_prompts(self, mock_get_llm_batcher):
+        """Test that identical prompts are only sent to the LLM once."""
+        mock_get_llm_batcher.return_value.submit = AsyncMock(return_value="cached response")
+        
+        async def query_twice(agent):
+            return [await agent.query_llm("Test prompt"), await agent.query_llm("Test prompt")]
+        
+        self.assertEqual(asyncio.run(query_twice(self.agent)), ["cached response"] * 2)
+        mock_get_llm_batcher.return_value.submit.assert_awaited_once_with("Test prompt")
+        
+        # With the cache disabled every call reaches the LLM
+        agent = CodeAgent(tools=[], enable_cache=False)
+        asyncio.run(query_twice(agent))
+        self.assertEqual(mock_get_llm_batcher.return_value.submit.await_count, 3)
+    
     def test_execute_linux_command_success(self):
         """Test the _execute_linux_command method with a successful command."""
         # Use a simple command that should work on most systems
-        result = self.agent._execute_linux_command("echo 'test'")
+        result = asyncio.run(self.agent._execute_linux_command("echo 'test'"))
         
         self.assertIn("test", result["stdout"])
         self.assertEqual(result["stderr"], "")
@@ -119,7 +138,7 @@ class TestCodeAgent(unittest.TestCase):
     def test_execute_linux_command_failure(self):
         """Test the _execute_linux_command method with a failing command."""
         # Use a command that should fail on most systems
-        result = self.agent._execute_linux_command("command_that_does_not_exist")
+        result = asyncio.run(self.agent._execute_linux_command("command_that_does_not_exist"))
         
         self.assertNotEqual(result["returncode"], 0)
         self.assertNotEqual(result["stderr"], "")
@@ -127,19 +146,210 @@ class TestCodeAgent(unittest.TestCase):
     def test_execute_linux_command_with_empty_command(self):
         """Test the _execute_linux_command method with an empty command."""
         # Empty command should still be executed but return an error
-        result = self.agent._execute_linux_command("")
+        result = asyncio.run(self.agent._execute_linux_command(""))
         
         self.assertNotEqual(result["returncode"], 0)
     
-    @patch('subprocess.run')
-    def test_execute_linux_command_exception(self, mock_subprocess_run):
+    def test_run_shell_mode(self):
+        """Test that shell mode runs the command extracted from the LLM response."""
+        agent = CodeAgent(tools=[], mode="shell")
+        
+        with patch.object(agent, 'query_llm', AsyncMock(return_value="<code>echo 'hi'</code>")):
+            result = agent.run("Say hi")
+        
+        self.assertTrue(result["success"])
+        self.assertEqual(result["linux_cmd"], "echo 'hi'")
+        self.assertEqual(result["stdout"], "hi\n")
+        self.assertEqual(result["returncode"], 0)
+        self.assertEqual(agent.model_id, "gpt-3.5-turbo")
+    
+    def test_invalid_mode(self):
+        """Test that an unknown mode is rejected."""
+        with self.assertRaises(ValueError):
+            CodeAgent(tools=[], mode="ruby")
+    
+    def test_split_command(self):
+        """Test that only commands without shell syntax bypass the shell."""
+        self.assertEqual(self.agent._split_command("ls -la 'my dir'"), ["ls", "-la", "my dir"])
+        self.assertIsNone(self.agent._split_command("ls | wc -l"))
+        self.assertIsNone(self.agent._split_command("echo $HOME"))
+        self.assertIsNone(self.agent._split_command("cd /tmp"))
+    
+    def test_execute_linux_command_with_pipe(self):
+        """Test that commands needing a shell still run through it."""
+        result = asyncio.run(self.agent._execute_linux_command("printf 'a\\nb\\n' | wc -l"))
+        
+        self.assertEqual(result["stdout"].strip(), "2")
+        self.assertEqual(result["returncode"], 0)
+    
+    @patch('src.agent.code_agent._MAX_CONCURRENT_COMMANDS', 1)
+    def test_execute_linux_command_bounds_concurrency(self):
+        """Test that concurrent commands wait for a free slot."""
+        async def run_all():
+            start = time.monotonic()
+            await asyncio.gather(*[self.agent._execute_linux_command("sleep 0.1") for _ in range(3)])
+            return time.monotonic() - start
+        
+        self.assertGreaterEqual(asyncio.run(run_all()), 0.3)
+    
+    @patch('src.agent.code_agent._MAX_OUTPUT_BYTES', 10)
+    def test_execute_linux_command_truncates_output(self):
+        """Test that output beyond the byte cap is dropped and flagged."""
+        result = asyncio.run(self.agent._execute_linux_command("printf '0123456789abcdef'"))
+        
+        self.assertEqual(result["stdout"], "0123456789")
+        self.assertTrue(result["truncated"])
+        self.assertEqual(result["returncode"], 0)
+    
+    @patch('asyncio.create_subprocess_exec')
+    @patch('asyncio.create_subprocess_shell')
+    def test_execute_linux_command_exception(self, mock_create_subprocess_shell, mock_create_subprocess_exec):
         """Test the _execute_linux_command method when an exception occurs."""
-        # Setup mock to raise an exception
-        mock_subprocess_run.side_effect = Exception("Test exception")
+        # Setup mocks to raise an exception
+        mock_create_subprocess_shell.side_effect = Exception("Test exception")
+        mock_create_subprocess_exec.side_effect = Exception("Test exception")
         
         # This should handle the exception gracefully
         with self.assertRaises(Exception):
-            self.agent._execute_linux_command("echo 'test'")
+            asyncio.run(self.agent._execute_linux_command("echo 'test'"))
+    
+    @patch.object(CodeAgent, 'query_llm')
+    def test_run_async_concurrent(self, mock_query_llm):
+        """Test that several run_async calls can be gathered on one event loop."""
+        mock_query_llm.return_value = "```py\nfinal_answer(42)\n```"
+        
+        async def run_all():
+            return await asyncio.gather(*[self.agent.run_async(f"task {i}") for i in range(3)])
+        
+        results = asyncio.run(run_all())
+        
+        self.assertEqual(len(results), 3)
+        for result in results:
+            self.assertEqual(result["final_answer"], "42")
+            self.assertTrue(result["success"])
+
+    def test_run_batch_async_bounds_concurrency(self):
+        """Test that run_batch_async keeps at most max_concurrency tasks in flight."""
+        in_flight = 0
+        peak = 0
+        
+        async def fake_query_llm(prompt):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return "```py\nfinal_answer('ok')\n```"
+        
+        with patch.object(self.agent, 'query_llm', side_effect=fake_query_llm):
+            results = asyncio.run(self.agent.run_batch_async([f"task {i}" for i in range(5)], max_concurrency=2))
+        
+        self.assertEqual([r["final_answer"] for r in results], ["ok"] * 5)
+        self.assertEqual(peak, 2)
+    
+    def test_run_batch_async_deduplicates_tasks(self):
+        """Test that repeated tasks are only run once."""
+        with patch.object(self.agent, 'run_async', AsyncMock(side_effect=lambda task: {"final_answer": task})) as mock_run_async:
+            results = asyncio.run(self.agent.run_batch_async(["a", "b", "a"]))
+        
+        self.assertEqual([r["final_answer"] for r in results], ["a", "b", "a"])
+        self.assertEqual(mock_run_async.await_count, 2)
+    
+    def test_run_batch_async_resumes_from_checkpoint(self):
+        """Test that tasks recorded in the checkpoint are not run again."""
+        with tempfile.TemporaryDirectory() as tmp:
+            checkpoint_path = os.path.join(tmp, "batch.jsonl")
+            with patch.object(self.agent, 'run_async', AsyncMock(side_effect=lambda task: {"final_answer": task})) as mock_run_async:
+                asyncio.run(self.agent.run_batch_async(["a", "b"], checkpoint_path=checkpoint_path))
+                results = asyncio.run(self.agent.run_batch_async(["a", "b", "c"], checkpoint_path=checkpoint_path))
+            
+            self.assertEqual([r["final_answer"] for r in results], ["a", "b", "c"])
+            self.assertEqual([c.args[0] for c in mock_run_async.await_args_list], ["a", "b", "c"])
+            with open(checkpoint_path) as f:
+                self.assertEqual(len(f.readlines()), 3)
+    
+    def test_run_batch_async_checkpoints_around_failures(self):
+        """Test that a failing task neither loses the others' rows nor is skipped on resume."""
+        async def fake_run_async(task):
+            if task == "bad":
+                raise RuntimeError("LLM error")
+            await asyncio.sleep(0.01)
+            return {"final_answer": task, "success": True}
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            checkpoint_path = os.path.join(tmp, "batch.jsonl")
+            with patch.object(self.agent, 'run_async', AsyncMock(side_effect=fake_run_async)) as mock_run_async:
+                results = asyncio.run(self.agent.run_batch_async(["a", "bad", "b"], checkpoint_path=checkpoint_path))
+                self.assertEqual(results[1], {"success": False, "error": "LLM error"})
+                self.assertEqual([r["final_answer"] for r in (results[0], results[2])], ["a", "b"])
+                with open(checkpoint_path) as f:
+                    self.assertEqual(len(f.readlines()), 3)
+                
+                mock_run_async.reset_mock()
+                asyncio.run(self.agent.run_batch_async(["a", "bad", "b"], checkpoint_path=checkpoint_path))
+                self.assertEqual([c.args[0] for c in mock_run_async.await_args_list], ["bad"])
+    
+    @patch.object(CodeAgent, 'query_llm')
+    def test_run_appends_observation_to_prompt(self, mock_query_llm):
+        """Test that each step's response and observation are fed into the next prompt."""
+        mock_query_llm.side_effect = [
+            "```py\nprint('a')\nprint('b')\n```",
+            "```py\nfinal_answer('done')\n```",
+        ]
+        agent = CodeAgent(tools=[], max_steps=2)
+        
+        result = agent.run("multi step task")
+        
+        self.assertEqual(result["final_answer"], "done")
+        self.assertEqual(result["steps"], 2)
+        second_prompt = mock_query_llm.call_args_list[1].args[0]
+        self.assertTrue(second_prompt.endswith("Observation: a\nb\n\n"))
+    
+    @patch.object(CodeAgent, 'query_llm')
+    def test_run_truncates_long_observation(self, mock_query_llm):
+        """Test that a long observation is capped before it is added to the prompt."""
+        mock_query_llm.side_effect = [
+            "```py\nprint('x' * 10000)\nprint('y')\n```",
+            "```py\nfinal_answer('done')\n```",
+        ]
+        agent = CodeAgent(tools=[], max_steps=2)
+        
+        agent.run("noisy task")
+        
+        second_prompt = mock_query_llm.call_args_list[1].args[0]
+        self.assertNotIn("x" * 4001, second_prompt)
+        self.assertIn("characters truncated]", second_prompt)
+    
+    def test_extract_codes_from_code_block(self):
+        """Test that code is extracted from a fenced python block."""
+        response = "Thought: compute it\nCode:\n```py\nresult = 1 + 1\nfinal_answer(result)\n```<end_code>"
+        
+        self.assertEqual(self.agent.extract_codes(response), "result = 1 + 1\nfinal_answer(result)")
+    
+    def test_extract_codes_from_plain_text(self):
+        """Test that prose without code yields no code."""
+        self.assertIsNone(self.agent.extract_codes("I am not sure how to solve this task."))
+    
+    def test_extract_codes_bare_code_is_compiled_once(self):
+        """Test that a bare-code response is compiled once and reused for execution."""
+        code = "print('hi')\nprint('again')"
+        
+        self.assertEqual(self.agent.extract_codes(code), code)
+        hits = compile_code.cache_info().hits
+        self.assertEqual(self.agent.get_observation(code), "hi\nagain\n")
+        self.assertEqual(compile_code.cache_info().hits, hits + 1)
+    
+    def test_extract_codes_accepts_any_bare_code(self):
+        """Test that bare code is accepted whatever statement it starts with."""
+        for code in ("result = 2+2\nprint(result)", "# add\nx = 1", "for i in range(2):\n    print(i)"):
+            self.assertEqual(self.agent.extract_codes(code), code)
+        self.assertIsNone(self.agent.extract_codes("This is not code."))
+    
+    def test_extract_final_answer(self):
+        """Test that the final answer is extracted from the observation."""
+        observation = "step 1\nFinal answer: 42\n"
+        
+        self.assertEqual(self.agent.extract_final_answer(observation), "42")
 
 if __name__ == '__main__':
     unittest.main() 
\ No newline at end of file
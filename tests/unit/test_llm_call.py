@@ -0,0 +1,226 @@
+import unittest
+from unittest.mock import patch, MagicMock, AsyncMock
+import json
+import asyncio
+import src.llm_call as llm_call_module
+from src.llm_call import LLMBatcher, close_async_clients, extract_xml, get_async_client, get_client, llm_call_batch_offline
+
+class TestLLMBatcher(unittest.TestCase):
+
+    @patch('src.llm_call.llm_call_async')
+    def test_submit_coalesces_prompts(self, mock_llm_call):
+        """Test that concurrent submissions are dispatched as one batch"""
+        async def fake_llm_call_async(prompt, system_prompt, model, trace=True):
+            return f"echo: {prompt}"
+        mock_llm_call.side_effect = fake_llm_call_async
+        batcher = LLMBatcher("test-model", max_batch_size=8, max_latency=0.05)
+
+        async def submit_all():
+            return await asyncio.gather(*[batcher.submit(f"prompt {i}") for i in range(3)])
+
+        with patch('src.llm_call.llm_call_batch', wraps=llm_call_module.llm_call_batch) as mock_batch:
+            responses = asyncio.run(submit_all())
+
+        self.assertEqual(responses, ["echo: prompt 0", "echo: prompt 1", "echo: prompt 2"])
+        mock_batch.assert_called_once()
+
+    @patch('src.llm_call.llm_call_async')
+    def test_submit_propagates_errors(self, mock_llm_call):
+        """Test that a failing call raises in its own caller only"""
+        async def fake_llm_call_async(prompt, system_prompt, model, trace=True):
+            if prompt == "bad":
+                raise RuntimeError("API error")
+            return "ok"
+        mock_llm_call.side_effect = fake_llm_call_async
+        batcher = LLMBatcher("test-model")
+
+        async def submit_all():
+            return await asyncio.gather(batcher.submit("good"), batcher.submit("bad"), return_exceptions=True)
+
+        good, bad = asyncio.run(submit_all())
+        self.assertEqual(good, "ok")
+        self.assertIsInstance(bad, RuntimeError)
+
+class FakeStream:
+    """Async iterator standing in for a streamed chat completion"""
+
+    def __init__(self, deltas):
+        self.deltas = list(deltas)
+        self.consumed = 0
+        self.close = AsyncMock()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.consumed == len(self.deltas):
+            raise StopAsyncIteration
+        delta = self.deltas[self.consumed]
+        self.consumed += 1
+        return MagicMock(choices=[MagicMock(delta=MagicMock(content=delta))])
+
+class TestLLMCallAsync(unittest.TestCase):
+
+    @patch('src.llm_call.get_async_client')
+    def test_stream_stops_at_marker(self, mock_get_async_client):
+        """Test that streaming stops once the stop marker is seen, even across chunks"""
+        stream = FakeStream(["Code:\nprint(1)\nObs", "ervation: 1", "never read"])
+        client = MagicMock()
+        client.chat.completions.create = AsyncMock(return_value=stream)
+        mock_get_async_client.return_value = client
+
+        response = asyncio.run(llm_call_module.llm_call_async("prompt", model="qwen2.5:1.5b"))
+
+        self.assertEqual(response, "Code:\nprint(1)\n")
+        self.assertEqual(stream.consumed, 2)
+        stream.close.assert_awaited_once()
+
+    @patch('src.llm_call.get_async_client')
+    def test_stream_without_marker(self, mock_get_async_client):
+        """Test that the full text is returned when the marker never appears"""
+        stream = FakeStream(["Final ", None, "answer: 4"])
+        client = MagicMock()
+        client.chat.completions.create = AsyncMock(return_value=stream)
+        mock_get_async_client.return_value = client
+
+        response = asyncio.run(llm_call_module.llm_call_async("prompt", model="qwen2.5:1.5b"))
+
+        self.assertEqual(response, "Final answer: 4")
+
+class TestLLMBatcherDispatch(unittest.TestCase):
+
+    @patch('src.llm_call.llm_call_async')
+    def test_later_prompt_not_blocked_by_slow_batch(self, mock_llm_call):
+        """Test that a prompt arriving during an in-flight batch does not wait for it"""
+        async def fake_llm_call_async(prompt, system_prompt, model, trace=True):
+            await asyncio.sleep(0.5 if prompt == "slow" else 0.01)
+            return prompt
+        mock_llm_call.side_effect = fake_llm_call_async
+        batcher = LLMBatcher("test-model", max_latency=0.01)
+
+        async def submit_both():
+            loop = asyncio.get_running_loop()
+            slow = asyncio.ensure_future(batcher.submit("slow"))
+            await asyncio.sleep(0.05)
+            start = loop.time()
+            fast = await batcher.submit("fast")
+            elapsed = loop.time() - start
+            return fast, elapsed, await slow
+
+        fast, elapsed, slow = asyncio.run(submit_both())
+        self.assertEqual((fast, slow), ("fast", "slow"))
+        self.assertLess(elapsed, 0.3)
+
+class TestLLMCallBatchOffline(unittest.TestCase):
+
+    @patch('src.llm_call.get_async_client')
+    def test_results_are_mapped_back_in_order(self, mock_get_async_client):
+        """Test that batch output lines are matched to prompts by custom_id"""
+        client = MagicMock()
+        client.files.create = AsyncMock(return_value=MagicMock(id="file-in"))
+        client.batches.create = AsyncMock(return_value=MagicMock(id="batch-1", status="in_progress"))
+        client.batches.retrieve = AsyncMock(
+            return_value=MagicMock(id="batch-1", status="completed", output_file_id="file-out")
+        )
+        output_lines = [
+            {"custom_id": "1", "response": {"body": {"choices": [{"message": {"content": "second"}}]}}},
+            {"custom_id": "0", "response": {"body": {"choices": [{"message": {"content": "first"}}]}}},
+            {"custom_id": "2", "response": None, "error": {"message": "failed"}},
+        ]
+        client.files.content = AsyncMock(
+            return_value=MagicMock(text="\n".join(json.dumps(line) for line in output_lines))
+        )
+        mock_get_async_client.return_value = client
+
+        responses = asyncio.run(llm_call_batch_offline(["a", "b", "c"], poll_interval=0))
+
+        self.assertEqual(responses, ["first", "second", None])
+        client.batches.retrieve.assert_awaited_once_with("batch-1")
+
+    def test_rejects_local_models(self):
+        """Test that non-OpenAI models are rejected"""
+        with self.assertRaises(ValueError):
+            asyncio.run(llm_call_batch_offline(["a"], model="qwen2.5:1.5b"))
+
+class TestGetClient(unittest.TestCase):
+
+    def test_client_is_reused(self):
+        """Test that clients are cached per endpoint"""
+        self.assertIs(get_client("qwen2.5:1.5b"), get_client("qwen2.5:7b"))
+
+    def test_client_retries_transient_errors(self):
+        """Test that clients are configured to retry rate limits and server errors"""
+        self.assertEqual(get_client("qwen2.5:1.5b").max_retries, llm_call_module.MAX_RETRIES)
+
+    def test_async_client_is_closed(self):
+        """Test that closing the loop's async clients drops them from the registry"""
+        async def open_and_close():
+            client = get_async_client("qwen2.5:1.5b")
+            self.assertIs(client, get_async_client("qwen2.5:1.5b"))
+            await close_async_clients()
+            return client, get_async_client("qwen2.5:1.5b")
+
+        closed, reopened = asyncio.run(open_and_close())
+        self.assertTrue(closed.is_closed())
+        self.assertIsNot(closed, reopened)
+
+class TestLangfuseTracking(unittest.TestCase):
+
+    @patch('src.llm_call.LANGFUSE_ENABLED', True)
+    @patch('src.llm_call.langfuse', create=True)
+    def test_end_generation_does_not_flush(self, mock_langfuse):
+        """Test that recording a response does not block on a Langfuse flush"""
+        generation = MagicMock()
+        llm_call_module._end_generation(generation, "response")
+        generation.end.assert_called_once_with(output="response")
+        mock_langfuse.flush.assert_not_called()
+
+    @patch('src.llm_call.LANGFUSE_ENABLED', True)
+    @patch('src.llm_call.langfuse', create=True)
+    @patch('src.llm_call.get_client')
+    def test_untraced_call_skips_langfuse(self, mock_get_client, mock_langfuse):
+        """Test that trace=False never creates a Langfuse generation"""
+        mock_get_client.return_value.chat.completions.create.return_value = MagicMock(
+            choices=[MagicMock(message=MagicMock(content="ok"))]
+        )
+        self.assertEqual(llm_call_module.llm_call("prompt", model="qwen2.5:1.5b", trace=False), "ok")
+        mock_langfuse.generation.assert_not_called()
+
+    @patch('src.llm_call.llm_call_async')
+    def test_batch_passes_trace_through(self, mock_llm_call):
+        """Test that llm_call_batch forwards the trace flag to each call"""
+        mock_llm_call.side_effect = AsyncMock(return_value="ok")
+        asyncio.run(llm_call_module.llm_call_batch(["a", "b"], model="qwen2.5:1.5b", trace=False))
+        self.assertEqual([c.kwargs["trace"] for c in mock_llm_call.call_args_list], [False, False])
+
+class TestExtractXml(unittest.TestCase):
+
+    def test_extracts_first_tag(self):
+        """Test that the content of the first complete tag is returned"""
+        self.assertEqual(extract_xml("a <code>ls\n-la</code> <code>pwd</code>", "code"), "ls\n-la")
+        self.assertEqual(extract_xml("<code></code>", "code"), "")
+
+    def test_missing_tag(self):
+        """Test that an empty string is returned when the tag is absent or unclosed"""
+        self.assertEqual(extract_xml("no tags here", "code"), "")
+        self.assertEqual(extract_xml("<code>ls -la", "code"), "")
+        self.assertEqual(extract_xml("</code>ls<code>", "code"), "")
+
+class TestResponseCache(unittest.TestCase):
+
+    @patch('src.llm_call.get_client')
+    def test_llm_call_uses_response_cache(self, mock_get_client):
+        """Test that an identical call is answered from the response cache"""
+        client = MagicMock()
+        client.chat.completions.create.return_value = MagicMock(
+            choices=[MagicMock(message=MagicMock(content="cached answer"))]
+        )
+        mock_get_client.return_value = client
+        with patch('src.llm_call._response_cache', llm_call_module.LLMCache()):
+            first = llm_call_module.llm_call("same prompt", model="qwen2.5:1.5b")
+            second = llm_call_module.llm_call("same prompt", model="qwen2.5:1.5b")
+        self.assertEqual((first, second), ("cached answer", "cached answer"))
+        client.chat.completions.create.assert_called_once()
+
+if __name__ == '__main__':
+    unittest.main()
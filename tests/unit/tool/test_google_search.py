@@ -0,0 +1,59 @@
+import unittest
+from unittest.mock import patch
+import asyncio
+import time
+from src.tool.google_search import GoogleSearch, _normalize_url
+
+class TestGoogleSearch(unittest.TestCase):
+
+    @patch('src.tool.google_search.random.uniform', return_value=0)
+    @patch('src.tool.google_search.search')
+    def test_run_async_does_not_block_loop(self, mock_search, mock_uniform):
+        """Test that concurrent async searches overlap instead of running serially"""
+        def slow_search(query, num_results):
+            time.sleep(0.2)
+            return ["https://www.example.com/page"]
+        mock_search.side_effect = slow_search
+        tool = GoogleSearch()
+
+        async def search_all():
+            return await asyncio.gather(*[tool.run_async("query") for _ in range(3)])
+
+        start = time.monotonic()
+        results = asyncio.run(search_all())
+        elapsed = time.monotonic() - start
+
+        self.assertLess(elapsed, 0.5)
+        self.assertEqual(len(results), 3)
+        self.assertEqual(results[0][0]["url"], "https://www.example.com/page")
+        self.assertEqual(results[0][0]["title"], "example.com")
+
+    @patch('src.tool.google_search.time.sleep')
+    @patch('src.tool.google_search.random.uniform', return_value=0)
+    @patch('src.tool.google_search.search', return_value=["https://example.com"])
+    def test_run_async_awaits_the_delay(self, mock_search, mock_uniform, mock_sleep):
+        """Test that the async path never blocks on time.sleep"""
+        results = asyncio.run(GoogleSearch().run_async("query"))
+        self.assertEqual(results[0]["url"], "https://example.com")
+        mock_sleep.assert_not_called()
+
+    @patch('src.tool.google_search.random.uniform', return_value=0)
+    @patch('src.tool.google_search.search')
+    def test_run_skips_equivalent_urls(self, mock_search, mock_uniform):
+        """Test that URLs differing only by tracking params, fragment or slash are returned once"""
+        mock_search.return_value = [
+            "https://Example.com/page/",
+            "https://example.com/page?utm_source=x#top",
+            "https://example.com/other",
+        ]
+        results = GoogleSearch().run("query")
+        self.assertEqual([r["url"] for r in results],
+                         ["https://Example.com/page/", "https://example.com/other"])
+
+    def test_normalize_url_keeps_other_params(self):
+        """Test that non-tracking query parameters are preserved"""
+        self.assertEqual(_normalize_url("HTTPS://Example.com/a/?id=1&utm_medium=y"),
+                         "https://example.com/a?id=1")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,7 +2,7 @@ import unittest
 from unittest.mock import patch
 import sys
 import io
-from src.tool.python_runner import PythonRunner
+from src.tool.python_runner import PythonRunner, compile_code
 
 class TestPythonRunner(unittest.TestCase):
     
@@ -105,5 +105,40 @@ except NameError:
         result2 = self.python_runner.run({"code": code2})
         self.assertEqual(result2["output"], "x is not defined\n")
 
+    def test_shared_namespace_persists_variables(self):
+        """Test that variables persist when the same namespace is reused"""
+        namespace = self.python_runner.new_namespace()
+        self.python_runner.run({"code": "import math\nx = 42"}, namespace)
+        result = self.python_runner.run({"code": "print(x, math.floor(1.5))"}, namespace)
+        self.assertEqual(result["output"], "42 1\n")
+    
+    def test_final_answer_helper(self):
+        """Test that final_answer is available without being defined"""
+        result = self.python_runner.run({"code": "final_answer(3 * 7)"})
+        self.assertEqual(result["output"], "Final answer: 21\n")
+    
+    def test_timeout(self):
+        """Test that long-running code is interrupted after the timeout"""
+        runner = PythonRunner(timeout=0.1)
+        result = runner.run({"code": "while True:\n    pass"})
+        self.assertFalse(result["success"])
+        self.assertIn("timed out", result["output"])
+
+    def test_stdout_restored_after_error(self):
+        """Test that stdout is restored when the code fails"""
+        stdout = sys.stdout
+        result = self.python_runner.run({"code": "print('partial')\nraise KeyError('boom')"})
+        self.assertFalse(result["success"])
+        self.assertIs(sys.stdout, stdout)
+
+    def test_repeated_code_is_compiled_once(self):
+        """Test that running the same snippet again reuses its code object"""
+        code = 'print("cached")'
+        self.python_runner.run({"code": code})
+        hits = compile_code.cache_info().hits
+        result = self.python_runner.run({"code": code})
+        self.assertEqual(result["output"], "cached\n")
+        self.assertEqual(compile_code.cache_info().hits, hits + 1)
+
 if __name__ == '__main__':
     unittest.main() 
\ No newline at end of file
@@ -0,0 +1,78 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import patch
+from src.utils.llm_cache import LLMCache
+
+class TestLLMCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = LLMCache(max_size=2)
+        self.messages = [{"role": "user", "content": "What is 2 + 2?"}]
+
+    def test_get_and_set(self):
+        """Test that a stored response is returned for the same request only"""
+        self.assertIsNone(self.cache.get("gpt-4o", self.messages))
+        self.cache.set("gpt-4o", self.messages, "4")
+        self.assertEqual(self.cache.get("gpt-4o", self.messages), "4")
+        self.assertIsNone(self.cache.get("gpt-4o-mini", self.messages))
+        self.assertIsNone(self.cache.get("gpt-4o", self.messages, temperature=0.7))
+
+    def test_lru_eviction(self):
+        """Test that the least recently used entry is evicted when full"""
+        other = [{"role": "user", "content": "other"}]
+        third = [{"role": "user", "content": "third"}]
+        self.cache.set("m", self.messages, "a")
+        self.cache.set("m", other, "b")
+        self.cache.get("m", self.messages)
+        self.cache.set("m", third, "c")
+        self.assertEqual(len(self.cache), 2)
+        self.assertEqual(self.cache.get("m", self.messages), "a")
+        self.assertIsNone(self.cache.get("m", other))
+
+    @patch('src.utils.llm_cache.time.monotonic')
+    def test_ttl_expiry(self, mock_monotonic):
+        """Test that entries older than the ttl are not returned"""
+        cache = LLMCache(ttl=10)
+        mock_monotonic.return_value = 100.0
+        cache.set("m", self.messages, "a")
+        mock_monotonic.return_value = 105.0
+        self.assertEqual(cache.get("m", self.messages), "a")
+        mock_monotonic.return_value = 111.0
+        self.assertIsNone(cache.get("m", self.messages))
+
+    def test_persists_to_disk(self):
+        """Test that responses written to the SQLite file are read back by a new cache"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "cache", "llm.sqlite")
+            LLMCache(path=path).set("m", self.messages, "a")
+            reopened = LLMCache(path=path)
+            self.assertEqual(reopened.get("m", self.messages), "a")
+            self.assertEqual((reopened.hits, reopened.misses), (1, 0))
+            reopened.clear()
+            self.assertIsNone(LLMCache(path=path).get("m", self.messages))
+
+    @patch('src.utils.llm_cache.time.time')
+    @patch('src.utils.llm_cache.time.monotonic')
+    def test_disk_hit_keeps_original_ttl(self, mock_monotonic, mock_time):
+        """Test that an entry loaded from disk expires relative to when it was written"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "llm.sqlite")
+            mock_time.return_value = 1000.0
+            mock_monotonic.return_value = 50.0
+            LLMCache(ttl=10, path=path).set("m", self.messages, "a")
+
+            reopened = LLMCache(ttl=10, path=path)
+            mock_time.return_value = 1008.0
+            mock_monotonic.return_value = 70.0
+            self.assertEqual(reopened.get("m", self.messages), "a")
+            mock_time.return_value = 1018.0
+            mock_monotonic.return_value = 80.0
+            self.assertIsNone(reopened.get("m", self.messages))
+            self.assertIsNone(LLMCache(ttl=10, path=path).get("m", self.messages))
+            with sqlite3.connect(path) as db:
+                self.assertEqual(db.execute("SELECT COUNT(*) FROM responses").fetchone()[0], 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import os
+import tempfile
+import threading
+import unittest
+from src.utils import logging_utils
+from src.utils.logging_utils import ClassLoggerMixin, flush_logs, setup_logger
+
+class TestQueuedLogging(unittest.TestCase):
+
+    def test_loggers_share_one_listener(self):
+        """Test that queued loggers share one listener and still write to their own files"""
+        with tempfile.TemporaryDirectory() as tmp:
+            before = threading.active_count()
+            first = setup_logger("tests.queued.first", log_to_console=False, log_dir=tmp)
+            second = setup_logger("tests.queued.second", log_to_console=False, log_dir=tmp)
+            self.assertEqual(threading.active_count(), before)
+
+            first.info("from first")
+            second.info("from second")
+            logging_utils._log_queue.join()
+
+            with open(os.path.join(tmp, "tests_queued_first.log")) as f:
+                self.assertEqual([line.split(" - ")[-1] for line in f], ["from first\n"])
+            with open(os.path.join(tmp, "tests_queued_second.log")) as f:
+                self.assertEqual([line.split(" - ")[-1] for line in f], ["from second\n"])
+            for name in ("tests.queued.first", "tests.queued.second"):
+                for handler in logging_utils._handler_router.routes.pop(name):
+                    handler.close()
+
+    def test_flush_logs_keeps_listening(self):
+        """Test that records logged after a flush are still written"""
+        with tempfile.TemporaryDirectory() as tmp:
+            logger = setup_logger("tests.queued.flush", log_to_console=False, log_dir=tmp)
+
+            logger.info("before flush")
+            flush_logs()
+            with open(os.path.join(tmp, "tests_queued_flush.log")) as f:
+                self.assertEqual([line.split(" - ")[-1] for line in f], ["before flush\n"])
+
+            logger.info("after flush")
+            logging_utils._log_queue.join()
+            with open(os.path.join(tmp, "tests_queued_flush.log")) as f:
+                self.assertEqual(
+                    [line.split(" - ")[-1] for line in f], ["before flush\n", "after flush\n"]
+                )
+            for handler in logging_utils._handler_router.routes.pop("tests.queued.flush"):
+                handler.close()
+
+class TestClassLoggerMixin(unittest.TestCase):
+
+    def test_logger_set_once_per_subclass(self):
+        """Test that subclasses get their own logger and the mixing base gets none"""
+        class Base(ClassLoggerMixin):
+            pass
+
+        class Concrete(Base):
+            pass
+
+        self.assertFalse(hasattr(Base, "logger"))
+        self.assertEqual(Concrete.logger.name, f"{__name__}.Concrete")
+        self.assertIs(Concrete().logger, Concrete().logger)
+
+if __name__ == '__main__':
+    unittest.main()